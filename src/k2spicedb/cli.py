@@ -4,16 +4,21 @@ Allows users to parse Keycloak exports and generate SpiceDB schemas via command
 """
 
 import argparse
+import asyncio
 import sys
 import os
 import logging
-from typing import List
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from k2spicedb.keycloak_parser import KeycloakParser
-from k2spicedb.llm_transformer import LLMTransformer
+from k2spicedb.llm_transformer import DEFAULT_CACHE_DIR, LLMTransformer
 from k2spicedb.schema_generator import SchemaGenerator
 
+# Parser used by ProcessPoolExecutor workers (see _init_worker).
+_worker_parser = None
+
 
 def setup_logging(verbose: bool):
     """Configures logging level based on verbosity."""
@@ -35,6 +40,10 @@ def parse_arguments(argv: List[str] = None) -> argparse.Namespace:
                         help="OpenAI model to use for LLM-based schema generation (default: text-davinci-003).")
     parser.add_argument("--no-llm", action="store_true",
                         help="Disable LLM integration and use deterministic schema generation only.")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=False,
+                        help=f"Reuse cached LLM schemas for unchanged prompts (default: disabled, stored in {DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Number of realms to send to the LLM in a single request (default: 1). Ignored with --no-llm.")
     parser.add_argument("-j", "--jobs", type=int, default=4,
                         help="Number of files to process in parallel (default: 4). Use 1 to disable concurrency.")
     parser.add_argument("-v", "--verbose", action="store_true",
@@ -47,7 +56,9 @@ def get_input_files(input_paths: List[str]) -> List[str]:
     files = []
     for path in input_paths:
         if os.path.isdir(path):
-            files.extend(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(".json"))
+            with os.scandir(path) as entries:
+                files.extend(entry.path for entry in entries
+                             if entry.name.lower().endswith(".json") and entry.is_file())
         else:
             files.append(path)
 
@@ -78,6 +89,29 @@ def determine_output_paths(input_files: List[str], output_arg: str):
     return None, output_arg or os.path.join(os.getcwd(), "output.zed")  # 🔥 Ensure output_file is never empty
 
 
+def _derive_output_path(input_path: str, output_dir: str) -> str:
+    """Returns the .zed path in output_dir for an input file when processing multiple inputs."""
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(input_path))[0] + ".zed")
+
+
+def _write_schema(path: str, schema_text: str):
+    """Writes the schema as UTF-8 with a single encode and as few write() syscalls as possible."""
+    data = memoryview(schema_text.encode("utf-8"))
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    try:
+        fd = os.open(path, flags, 0o644)
+    except FileNotFoundError:
+        # Only pay for makedirs' stat calls when the parent directory is actually missing.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, flags, 0o644)
+    try:
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+    finally:
+        os.close(fd)
+
+
 def process_file(input_path: str, output_path: str, parser_obj, transformer):
     """Processes a single Keycloak export file, generating and saving the SpiceDB schema."""
     try:
@@ -86,28 +120,154 @@ def process_file(input_path: str, output_path: str, parser_obj, transformer):
 
         schema_text = transformer.transform(realm) if transformer else SchemaGenerator.generate_schema(realm)
 
-        if not schema_text.strip():
-            logging.warning("Skipping empty schema for realm '%s'", realm.name)
-            return False
+        return _save_schema(realm, schema_text, output_path)
+    except Exception as e:
+        logging.error("Failed to process %s: %s", input_path, e)
+        return False
 
-        if not output_path.strip():  # 🔥 Check if output_path is empty or blank
-            logging.error("Output path is empty! This should never happen.")
-            return False
 
-        abs_output_path = os.path.abspath(output_path)  # 🔥 Convert to absolute path
-        print(f"DEBUG: Writing to absolute path: {abs_output_path}")
+async def _process_with_llm(pairs: List[Tuple[str, str]], parser_obj, transformer,
+                            jobs: int, batch_size: int, verbose: bool = False) -> List[bool]:
+    """
+    Runs LLM-backed processing as a pipeline: a process pool parses the exports (CPU-bound) and
+    feeds the realms through a queue to `jobs` consumers that call the LLM and write the output
+    (network-bound), so parsing and LLM requests overlap instead of alternating per file.
+    """
+    results = [False] * len(pairs)
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    consumers = max(1, jobs)
+
+    async def parse(parse_pool, index: int):
+        input_path = pairs[index][0]
+        try:
+            logging.info("Processing: %s", input_path)
+            realm = await loop.run_in_executor(parse_pool, _parse_file_in_worker, input_path)
+        except Exception as e:
+            logging.error("Failed to process %s: %s", input_path, e)
+            return
+        await queue.put((index, realm))
+
+    async def produce(parse_pool):
+        await asyncio.gather(*(parse(parse_pool, index) for index in range(len(pairs))))
+        for _ in range(consumers):
+            await queue.put(None)  # One sentinel per consumer
+
+    async def consume():
+        finished = False
+        while not finished:
+            item = await queue.get()
+            if item is None:
+                return
+            # Batch together whatever else has already been parsed, up to batch_size realms.
+            batch = [item]
+            while len(batch) < batch_size and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+
+            try:
+                schema_texts = await transformer.atransform_batch([realm for _, realm in batch])
+            except Exception as e:
+                for index, _ in batch:
+                    logging.error("Failed to process %s: %s", pairs[index][0], e)
+                continue
+
+            for (index, realm), schema_text in zip(batch, schema_texts):
+                input_path, output_path = pairs[index]
+                try:
+                    results[index] = await asyncio.to_thread(_save_schema, realm, schema_text, output_path)
+                except Exception as e:
+                    logging.error("Failed to process %s: %s", input_path, e)
+
+    with _process_pool(min(consumers, len(pairs)), parser_obj, verbose) as parse_pool:
+        await asyncio.gather(produce(parse_pool), *(consume() for _ in range(consumers)))
+    return results
+
+
+def process_many(paths: List[str], max_workers: int = 8, model_name: str = "o3-mini",
+                 cache_dir: str = None) -> Dict[str, str]:
+    """
+    Parses and transforms several Keycloak exports with the LLM without writing any files.
+    Each file's parse and LLM request runs on a worker thread, so the network round-trips overlap.
+
+    :param paths: Paths of Keycloak realm JSON exports.
+    :param max_workers: Maximum number of files processed at once.
+    :param model_name: OpenAI model name passed to LLMTransformer.
+    :param cache_dir: Optional directory for cached LLM responses (disabled if None).
+    :return: Mapping of input path to generated schema; files that failed are logged and left out.
+    """
+    parser_obj = KeycloakParser()
+    transformer = LLMTransformer(model_name=model_name, cache_dir=cache_dir)
+    schemas = {}
 
-        os.makedirs(os.path.dirname(abs_output_path), exist_ok=True)  # Ensure directory exists
+    def run(path: str) -> str:
+        return transformer.transform(parser_obj.parse_file(path))
 
-        with open(abs_output_path, "w", encoding="utf-8") as f:
-            f.write(schema_text)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, path): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                schemas[path] = future.result()
+            except Exception as e:
+                logging.error("Failed to process %s: %s", path, e)
 
-        logging.info("Schema saved: %s", abs_output_path)
-        return True
-    except Exception as e:
-        logging.error("Failed to process %s: %s", input_path, e)
+    return {path: schemas[path] for path in paths if path in schemas}  # Keep the input order
+
+
+def _save_schema(realm, schema_text: str, output_path: str) -> bool:
+    """Writes a generated schema to output_path, returning False if there was nothing to save."""
+    if not schema_text.strip():
+        logging.warning("Skipping empty schema for realm '%s'", realm.name)
         return False
 
+    if not output_path.strip():  # 🔥 Check if output_path is empty or blank
+        logging.error("Output path is empty! This should never happen.")
+        return False
+
+    abs_output_path = os.path.abspath(output_path)  # 🔥 Convert to absolute path
+    logging.debug("Writing to absolute path: %s", abs_output_path)
+
+    _write_schema(abs_output_path, schema_text)
+
+    logging.info("Schema saved: %s", abs_output_path)
+    return True
+
+
+def _init_worker(parser_obj, verbose: bool):
+    """Stores the parser in a pool worker so it isn't pickled per task, and configures its logging."""
+    global _worker_parser  # pylint: disable=global-statement
+    _worker_parser = parser_obj
+    setup_logging(verbose)  # Spawned workers start unconfigured; forked ones already have handlers
+
+
+def _process_pool(max_workers: int, parser_obj, verbose: bool = False) -> ProcessPoolExecutor:
+    """
+    Creates a process pool whose workers reuse the parent's parser. Only parsing and deterministic
+    generation run in processes; LLM requests stay on the parent's event loop.
+
+    On Linux the pool forks, so workers inherit the parser (and every module already imported)
+    copy-on-write instead of re-importing and rebuilding it. Elsewhere the platform default
+    (spawn) is kept and workers receive a pickled copy through the initializer, which also sets up
+    their logging with the CLI's verbosity.
+    """
+    mp_context = multiprocessing.get_context("fork") if sys.platform.startswith("linux") else None
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context,
+                               initializer=_init_worker, initargs=(parser_obj, verbose))
+
+
+def _parse_file_in_worker(input_path: str):
+    """Parses a file in a pool worker using the parser stored by _init_worker."""
+    return _worker_parser.parse_file(input_path)
+
+
+def _process_file_in_worker(input_path: str, output_path: str) -> bool:
+    """Runs process_file with deterministic generation in a pool worker, using the parser stored by _init_worker."""
+    return process_file(input_path, output_path, _worker_parser, None)
+
 
 def main(argv: List[str] = None) -> int:
     """Main function for handling CLI execution."""
@@ -117,35 +277,39 @@ def main(argv: List[str] = None) -> int:
     input_files = get_input_files(args.input)
     output_dir, output_file = determine_output_paths(input_files, args.output)
 
-    print(f"DEBUG: output_dir={output_dir}, output_file={output_file}")  # 🔥 Debug print
+    logging.debug("output_dir=%s, output_file=%s", output_dir, output_file)
 
     if output_file is None and output_dir is None:
         logging.error("Both output_dir and output_file are None. This should never happen.")
         sys.exit(1)
     parser_obj = KeycloakParser()
-    transformer = None if args.no_llm else LLMTransformer(model_name=args.model)
+    transformer = None if args.no_llm else LLMTransformer(
+        model_name=args.model, cache_dir=DEFAULT_CACHE_DIR if args.cache else None)
 
     if not args.no_llm and os.getenv("OPENAI_API_KEY") is None:
         logging.warning("OPENAI_API_KEY environment variable is not set. OpenAI API calls may fail.")
 
+    # Resolve every output path once up front; all branches below share the same pairs.
+    pairs = [(path, output_file if len(input_files) == 1 else _derive_output_path(path, output_dir))
+             for path in input_files]
+
     # Process files (sequentially or with concurrency)
-    results = []
-    if len(input_files) > 1 and args.jobs > 1:
-        with ThreadPoolExecutor(max_workers=min(args.jobs, len(input_files))) as executor:
-            future_to_path = {
-                executor.submit(
-                    process_file,
-                    path,
-                    os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + ".zed"),  # ✅ Corrected naming
-                    parser_obj,
-                    transformer
-                ): path for path in input_files
-            }
-            results = [future.result() for future in as_completed(future_to_path)]
+    if transformer and len(pairs) > 1 and (args.jobs > 1 or args.batch_size > 1):
+        # LLM calls are network-bound, so interleave them on one event loop while processes parse.
+        results = asyncio.run(
+            _process_with_llm(pairs, parser_obj, transformer, args.jobs, max(1, args.batch_size), args.verbose)
+        )
+    elif len(pairs) > 1 and args.jobs > 1:
+        # Deterministic generation is CPU-bound, so use processes to sidestep the GIL.
+        in_paths, out_paths = zip(*pairs)
+        # Hand each worker several files per round-trip to cut IPC and Future bookkeeping.
+        chunksize = max(1, len(pairs) // (args.jobs * 4))
+        with _process_pool(min(args.jobs, len(pairs)), parser_obj, args.verbose) as executor:
+            results = list(executor.map(_process_file_in_worker, in_paths, out_paths, chunksize=chunksize))
     else:
-        for path in input_files:
-            out_path = output_file if len(input_files) == 1 else os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + ".zed")
-            results.append(process_file(path, out_path, parser_obj, transformer))
+        results = [False] * len(pairs)
+        for index, (path, out_path) in enumerate(pairs):
+            results[index] = process_file(path, out_path, parser_obj, transformer)
 
     success_count = sum(results)
     fail_count = len(results) - success_count
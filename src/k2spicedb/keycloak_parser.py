@@ -7,30 +7,67 @@ and convert it into a structured Python representation for further processing.
 
 import json
 import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import List, Dict, Sequence, Tuple
+
+try:
+    # orjson decodes straight from bytes and is several times faster than the stdlib parser.
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    _json_loads = json.loads
+
+try:
+    # simdjson lets us convert only the parts of a large export we actually read into Python objects.
+    import cysimdjson
+except ImportError:  # pragma: no cover - cysimdjson is an optional speedup
+    cysimdjson = None
+
+try:
+    # ijson streams a file as parse events, so huge exports never have to be held in memory whole.
+    import ijson
+except ImportError:  # pragma: no cover - ijson is optional
+    ijson = None
+
+# Top-level export keys read by parse_data; users, clients, flows etc. are never materialized.
+_REALM_KEYS = ("realm", "id", "roles", "groups")
+# Below this size simdjson's setup cost outweighs its faster scanning.
+_SIMDJSON_MIN_BYTES = 64 * 1024
+# From this size on, exports are streamed with ijson (if cysimdjson is not installed) rather than read into memory.
+_STREAM_MIN_BYTES = 64 * 1024 * 1024
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class Group:
     """Represents a Keycloak Group, possibly with nested subgroups."""
     name: str
     subgroups: List["Group"] = field(default_factory=list)
 
     def all_subgroup_names(self) -> List[str]:
-        """Recursively collects names of all subgroups."""
-        return [subgroup.name for subgroup in self.subgroups] + \
-               [name for subgroup in self.subgroups for name in subgroup.all_subgroup_names()]
+        """
+        Collects names of all nested subgroups: a group's direct subgroups first, then the nested
+        names under each of them in turn. Uses an explicit stack, so deep trees need no recursion.
+        """
+        names = []
+        pending = [self]
+        while pending:
+            group = pending.pop()
+            names.extend([sub.name for sub in group.subgroups])
+            pending.extend(reversed(group.subgroups))  # First subgroup is expanded next
+        return names
 
 
-@dataclass
+@dataclass(slots=True)
 class KeycloakRealm:
     """Structured representation of a Keycloak realm export."""
     name: str
     realm_roles: List[str] = field(default_factory=list)
-    client_roles: Dict[str, List[str]] = field(default_factory=dict)
+    client_roles: Dict[str, Sequence[str]] = field(default_factory=dict)
     groups: List[Group] = field(default_factory=list)
     composite_roles: Dict[str, List[str]] = field(default_factory=dict)
 
@@ -50,11 +87,90 @@ class KeycloakParser:
         """
         logger.debug("Reading Keycloak realm export from file: %s", file_path)
 
-        with open(file_path, "r", encoding="utf-8") as file:
-            data = json.load(file)
+        # Read the raw bytes in one go; the JSON decoder handles UTF-8 itself, which is much
+        # faster than json.load pulling characters through a text-mode file object.
+        with open(file_path, "rb") as file:
+            # simdjson is much faster on big files, so streaming is only the fallback when it is missing.
+            if cysimdjson is None and ijson is not None and os.fstat(file.fileno()).st_size >= _STREAM_MIN_BYTES:
+                data = self._stream(file)
+            else:
+                data = self._decode(file.read())
 
         return self.parse_data(data)
 
+    @staticmethod
+    def _decode(raw: bytes) -> dict:
+        """
+        Decodes a realm export. Large exports go through simdjson (when installed), which only
+        builds Python objects for the keys parse_data uses; everything else uses the JSON loader.
+
+        :param raw: Raw bytes of the Keycloak JSON file.
+        :return: Dictionary with (at least) the realm keys read by parse_data.
+        """
+        if cysimdjson is None or len(raw) < _SIMDJSON_MIN_BYTES:
+            return _json_loads(raw)
+
+        # The document borrows the parser's buffers, so the parser must outlive every access to it.
+        simd_parser = cysimdjson.JSONParser()
+        doc = simd_parser.parse(raw)
+        data = {}
+        for key in _REALM_KEYS:
+            value = doc.get(key)
+            if value is not None:
+                data[key] = value.export() if hasattr(value, "export") else value
+        return data
+
+    @staticmethod
+    def _stream(file) -> dict:
+        """
+        Streams a realm export with ijson, building Python objects only for the top-level keys
+        parse_data uses. Other sections (users, clients, events, ...) are skipped event by event,
+        so peak memory is bounded by the roles and groups rather than the whole file.
+
+        :param file: Keycloak JSON file opened in binary mode.
+        :return: Dictionary with the realm keys read by parse_data.
+        """
+        data = {}
+        events = ijson.parse(file, use_float=True)
+        if next(events, (None, None, None))[1] != "start_map":
+            raise ValueError("Keycloak realm export must be a JSON object")
+
+        for prefix, event, value in events:
+            if prefix or event != "map_key" or value not in _REALM_KEYS:
+                continue
+
+            key = value
+            builder = ijson.ObjectBuilder()
+            depth = 0
+            for _, event, value in events:
+                builder.event(event, value)
+                if event in ("start_map", "start_array"):
+                    depth += 1
+                elif event in ("end_map", "end_array"):
+                    depth -= 1
+                if not depth:
+                    break
+            data[key] = builder.value
+        return data
+
+    def parse_many(self, file_paths: List[str], max_workers: int = 4) -> List[KeycloakRealm]:
+        """
+        Parses several Keycloak realm export files concurrently.
+
+        Files are read on a thread pool so their disk I/O overlaps. JSON decoding itself
+        still holds the GIL (orjson included), so CPU-bound bulk runs should fan out over
+        processes instead, as the CLI does for --no-llm.
+
+        :param file_paths: Paths to Keycloak JSON files.
+        :param max_workers: Maximum number of files parsed at once.
+        :return: KeycloakRealm objects in the same order as file_paths.
+        """
+        if max_workers <= 1 or len(file_paths) <= 1:
+            return [self.parse_file(path) for path in file_paths]
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as executor:
+            return list(executor.map(self.parse_file, file_paths))
+
     def parse_data(self, data: dict) -> KeycloakRealm:
         """
         Parses a Keycloak realm JSON object into a structured KeycloakRealm instance.
@@ -64,9 +180,9 @@ class KeycloakParser:
         """
         realm_name = data.get("realm") or data.get("id") or "UnnamedRealm"
 
-        realm_roles = self._extract_realm_roles(data)
-        client_roles = self._extract_client_roles(data)
-        composite_roles = self._extract_composite_roles(data)
+        roles = data.get("roles") or {}
+        realm_roles, client_roles, composite_roles = self._extract_all_roles(
+            roles.get("realm") or [], roles.get("client") or {})
         groups = self._extract_groups(data)
 
         realm = KeycloakRealm(
@@ -88,32 +204,58 @@ class KeycloakParser:
 
         return realm
 
-    def _extract_realm_roles(self, data: dict) -> List[str]:
-        """Extracts and returns a list of realm-level roles."""
-        return [role.get("name") for role in data.get("roles", {}).get("realm", []) if role.get("name")]
+    def _extract_all_roles(self, realm_role_defs: List[dict], client_role_defs: Dict[str, List[dict]]) \
+            -> Tuple[List[str], Dict[str, Tuple[str, ...]], Dict[str, List[str]]]:
+        """
+        Extracts realm roles, client roles and composite role mappings in a single pass
+        over the role definitions.
 
-    def _extract_client_roles(self, data: dict) -> Dict[str, List[str]]:
-        """Extracts and returns a dictionary of client-specific roles."""
-        client_roles = {}
-        for client, roles in data.get("roles", {}).get("client", {}).items():
-            role_names = [role.get("name") for role in roles if role.get("name")]
-            if role_names:
-                client_roles[client] = role_names
-        return client_roles
+        Composite roles may include both realm and client roles. Client role names are stored as
+        tuples, and clients with identical role sets share a single tuple. Role, client and composite
+        part names are interned, so names repeated across the realm share one string object.
 
-    def _extract_composite_roles(self, data: dict) -> Dict[str, List[str]]:
-        """
-        Extracts composite roles, mapping them to their component roles.
-        Composite roles may include both realm and client roles.
+        :param realm_role_defs: The export's "roles.realm" list.
+        :param client_role_defs: The export's "roles.client" mapping of client to role list.
+        :return: Tuple of (realm roles, client roles by client, composite role components).
         """
+        realm_roles = []
+        client_roles = {}
         composite_roles = {}
-        for role in data.get("roles", {}).get("realm", []) + \
-                sum(data.get("roles", {}).get("client", {}).values(), []):
-            if role.get("composite") and role.get("composites"):
-                components = self._extract_composite_components(role)
-                if components:
-                    composite_roles[role["name"]] = components
-        return composite_roles
+        interned_role_sets = {}
+
+        # Hoist method lookups out of the loops, which run once per role in the export.
+        get = dict.get
+        intern = sys.intern
+        add_composite = self._add_composite
+
+        add_realm_role = realm_roles.append
+        for role in realm_role_defs:
+            name = get(role, "name")
+            if name:
+                add_realm_role(intern(name))
+            if get(role, "composite") and get(role, "composites"):
+                add_composite(role, composite_roles)
+
+        for client, roles in client_role_defs.items():
+            role_names = []
+            add_role_name = role_names.append
+            for role in roles:
+                name = get(role, "name")
+                if name:
+                    add_role_name(intern(name))
+                if get(role, "composite") and get(role, "composites"):
+                    add_composite(role, composite_roles)
+            if role_names:
+                role_names = tuple(role_names)
+                client_roles[intern(client)] = interned_role_sets.setdefault(role_names, role_names)
+
+        return realm_roles, client_roles, composite_roles
+
+    def _add_composite(self, role: dict, composite_roles: Dict[str, List[str]]):
+        """Maps a composite role to its components in composite_roles, if it has any."""
+        components = self._extract_composite_components(role)
+        if components:
+            composite_roles[sys.intern(role["name"])] = components
 
     def _extract_composite_components(self, role: dict) -> List[str]:
         """
@@ -125,23 +267,26 @@ class KeycloakParser:
         components = []
         composites = role.get("composites", {})
 
-        components.extend(composites.get("realm", []))
+        intern = sys.intern
+        components.extend([intern(r) for r in composites.get("realm", [])])
         for client, roles in composites.get("client", {}).items():
-            components.extend(f"{client}:{r}" for r in roles)
+            prefix = client + ":"
+            components.extend([intern(prefix + r) for r in roles])
 
         return components
 
     def _extract_groups(self, data: dict) -> List[Group]:
-        """Extracts and returns a list of Keycloak groups (including nested subgroups)."""
-        return [self._parse_group(group) for group in data.get("groups", [])]
-
-    def _parse_group(self, group_data: dict) -> Group:
         """
-        Recursively parses a group (and its subgroups) from Keycloak data.
+        Extracts and returns a list of Keycloak groups (including nested subgroups).
 
-        :param group_data: Dictionary representing a group.
-        :return: Group object with nested subgroups.
+        The group tree is built breadth-first from a worklist rather than recursively,
+        so deeply nested groups cost no extra Python frames.
         """
-        name = group_data.get("name", "")
-        subgroups = [self._parse_group(sub) for sub in group_data.get("subGroups", [])]
-        return Group(name=name, subgroups=subgroups)
+        groups = []
+        pending = deque((groups, group_data) for group_data in data.get("groups", []))
+        while pending:
+            parent_list, group_data = pending.popleft()
+            group = Group(name=group_data.get("name", ""))
+            parent_list.append(group)
+            pending.extend((group.subgroups, sub) for sub in group_data.get("subGroups", []))
+        return groups
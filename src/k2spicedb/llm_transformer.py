@@ -3,7 +3,14 @@ LLM Transformer Module.
 Uses LangChain to integrate with the OpenAI API for generating SpiceDB schemas from Keycloak realm data.
 """
 
+import asyncio
+import hashlib
 import logging
+import os
+import re
+import tempfile
+from collections import defaultdict
+from typing import List, Optional, Tuple
 from langchain_openai import OpenAI, ChatOpenAI
 from langchain_core.messages import HumanMessage
 from k2spicedb.keycloak_parser import KeycloakRealm
@@ -11,6 +18,28 @@ from k2spicedb.schema_generator import SchemaGenerator
 
 logger = logging.getLogger(__name__)
 
+# Default location for cached LLM responses (used by the CLI's --cache flag).
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "k2spicedb")
+
+# Invariant instructions that open every prompt. Keeping them first and byte-identical across
+# calls (no realm data, timestamps or ids) lets OpenAI-compatible endpoints serve the prefix
+# from their prompt cache, so only the per-realm tail is processed from scratch.
+PROMPT_HEADER = (
+    "Generate a SpiceDB schema definition that represents the Keycloak roles and groups described below.\n"
+    "- Define object types for users, groups, and any resources corresponding to clients.\n"
+    "- Include relations for group membership and role assignments (using role names as relation or permission names).\n"
+    "- If a role is composite or groups have subgroups, represent those relationships (e.g., permissions that combine other roles or a parent-child relation for groups).\n"
+    "Output *only* SpiceDB schema (object definitions) without additional explanation.\n\n"
+)
+
+# Marker line the LLM is asked to emit before each schema in a batched response.
+_BATCH_MARKER_RE = re.compile(r"^\s*//\s*=+\s*SCHEMA\s+(\d+)\s*=+\s*$", re.MULTILINE)
+
+# Realms with more clients than this are split into several prompts of at most this many clients.
+_CLIENTS_PER_PROMPT = 20
+# Maximum number of prompt chunks of one realm sent to the LLM at the same time.
+_MAX_CONCURRENT_CHUNKS = 8
+
 
 class LLMTransformer:
     """
@@ -19,7 +48,7 @@ class LLMTransformer:
     """
 
     def __init__(self, model_name: str = "o3-mini", temperature: float = 0.0,
-                 max_tokens: int = 1000, openai_api_key: str = None, llm=None):
+                 max_tokens: int = 1000, openai_api_key: str = None, llm=None, cache_dir: str = None):
         """
         Initializes the LLM transformer.
 
@@ -28,8 +57,14 @@ class LLMTransformer:
         :param max_tokens: Maximum tokens allowed in the LLM response.
         :param openai_api_key: API key for OpenAI (uses OPENAI_API_KEY env var if None).
         :param llm: Optional custom LLM instance for testing or alternative models.
+        :param cache_dir: Optional directory where LLM responses are cached per realm (disabled if None).
         """
         self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache_dir = cache_dir
+        self._prefix = PROMPT_HEADER
+        self._responses = {}  # In-memory schemas by prompt key, shared by every call on this instance
 
         if llm:
             self.llm = llm
@@ -43,6 +78,16 @@ class LLMTransformer:
                 OpenAI(model_name=model_name, temperature=temperature,
                        max_tokens=max_tokens, openai_api_key=openai_api_key)
 
+        # Pick how to call the LLM once, so each request is a single call with no type checks.
+        if hasattr(self.llm, "predict"):
+            self._invoke = self.llm.predict  # For LangChain LLMs with a predict method
+        elif isinstance(self.llm, ChatOpenAI):
+            self._invoke = self._invoke_chat
+        else:
+            self._invoke = self.llm  # Fallback to calling the LLM instance directly
+        # LangChain models are awaited directly (they use the async OpenAI client); other LLMs run on a thread.
+        self._ainvoke = self.llm.apredict if hasattr(self.llm, "apredict") else self._ainvoke_in_thread
+
     def transform(self, realm: KeycloakRealm) -> str:
         """
         Transforms a KeycloakRealm object into a SpiceDB schema using an LLM.
@@ -50,72 +95,400 @@ class LLMTransformer:
         :param realm: Parsed Keycloak realm data.
         :return: A generated SpiceDB schema as a string.
         """
-        prompt_text = self._generate_prompt(realm)
+        prompts, key, known = self._prepare(realm)
+        if known is not None:
+            return known
 
         try:
-            logger.info("Generating schema for realm '%s' using model '%s'.", realm.name, self.model_name)
-            logger.debug("LLM Prompt:\n%s", prompt_text)
+            return self._store_result(key, self._invoke_chunks(prompts))
+        except Exception as e:
+            return self._fallback(realm, e)
 
-            schema_text = self._invoke_llm(prompt_text)
-            return schema_text.strip()
+    async def atransform(self, realm: KeycloakRealm) -> str:
+        """
+        Asynchronous variant of transform, using the LLM's native async API when available
+        so many realms can be in flight without a thread per request.
+
+        :param realm: Parsed Keycloak realm data.
+        :return: A generated SpiceDB schema as a string.
+        """
+        prompts, key, known = self._prepare(realm)
+        if known is not None:
+            return known
 
+        try:
+            return self._store_result(key, await self._ainvoke_chunks(prompts))
         except Exception as e:
-            logger.error("LLM transformation failed for realm '%s': %s", realm.name, e)
-            logger.info("Falling back to deterministic schema generation for realm '%s'.", realm.name)
-            return SchemaGenerator.generate_schema(realm)
+            return self._fallback(realm, e)
+
+    async def atransform_batch(self, realms: List[KeycloakRealm]) -> List[str]:
+        """
+        Transforms several realms with a single LLM request, sharing one round-trip and one
+        copy of the instructions between them.
+
+        Empty and cached realms are served directly and left out of the request, and realms too
+        large for one prompt are transformed on their own. If the response cannot be split back
+        into one schema per realm, each realm is transformed on its own.
+
+        :param realms: Parsed Keycloak realms.
+        :return: Generated SpiceDB schemas, in the same order as realms.
+        """
+        schemas, keys, pending, oversized = self._lookup_batch(realms)
+        if len(pending) == 1:
+            oversized.append(pending.pop())  # A single realm needs no batch markers
+
+        batch = None
+        if pending:
+            prompt_text = self._generate_batch_prompt([realms[i] for i in pending])
+            try:
+                logger.info("Generating schemas for %d realms in one request using model '%s'.",
+                            len(pending), self.model_name)
+                logger.debug("LLM Prompt:\n%s", prompt_text)
+                batch = self._split_batch_response(await self._ainvoke(prompt_text), len(pending))
+            except Exception as e:
+                logger.error("Batched LLM transformation failed: %s", e)
+
+            if batch is None:
+                logger.info("Transforming %d realms individually instead.", len(pending))
+                oversized.extend(pending)
+            else:
+                self._store_batch(schemas, keys, pending, batch)
+
+        individual = await asyncio.gather(*(self.atransform(realms[i]) for i in oversized))
+        for i, schema_text in zip(oversized, individual):
+            schemas[i] = schema_text
+        return schemas
+
+    def _prepare(self, realm: KeycloakRealm) -> Tuple[Optional[List[str]], Optional[str], Optional[str]]:
+        """
+        Looks a realm up as in _lookup and, if the LLM has to be asked, logs the request.
+
+        :param realm: Parsed Keycloak realm data.
+        :return: Tuple of (prompts, prompt key, known schema) from _lookup.
+        """
+        prompts, key, known = self._lookup(realm)
+        if known is None:
+            logger.info("Generating schema for realm '%s' using model '%s'.", realm.name, self.model_name)
+            for prompt_text in prompts:
+                logger.debug("LLM Prompt:\n%s", prompt_text)
+        return prompts, key, known
+
+    def _lookup(self, realm: KeycloakRealm) -> Tuple[Optional[List[str]], Optional[str], Optional[str]]:
+        """
+        Finds a schema for a realm that does not need an LLM request: empty realms are generated
+        deterministically, and realms seen before are served from memory or the response cache.
+
+        :param realm: Parsed Keycloak realm data.
+        :return: Tuple of (prompts, prompt key, known schema); prompts and key are None for empty realms
+                 and the schema is None if the LLM must be asked.
+        """
+        if not (realm.realm_roles or realm.client_roles or realm.composite_roles or realm.groups):
+            logger.info("Realm '%s' has no roles or groups; generating its schema without the LLM.", realm.name)
+            return None, None, SchemaGenerator.generate_schema(realm)
+
+        prompts = self._chunk_prompts(realm)
+        key = self._prompt_key(prompts)
+        known = self._responses.get(key)
+        if known is not None:
+            logger.info("Reusing the schema generated for an identical realm '%s'.", realm.name)
+            return prompts, key, known
+
+        if self.cache_dir:
+            cache_path = self._cache_path(key)
+            known = self._read_cache(cache_path)
+            if known is not None:
+                logger.info("Using cached schema for realm '%s' (%s).", realm.name, cache_path)
+                self._responses[key] = known
+        return prompts, key, known
+
+    def _lookup_batch(self, realms: List[KeycloakRealm]):
+        """
+        Looks several realms up as in _lookup.
+
+        :param realms: Parsed Keycloak realms.
+        :return: Tuple of (schemas with None for misses, prompt keys, indices to generate in a batch,
+                 indices of realms too large to share a prompt).
+        """
+        schemas = [None] * len(realms)
+        keys = [None] * len(realms)
+        for i, realm in enumerate(realms):
+            _, keys[i], schemas[i] = self._lookup(realm)
+        pending = []
+        oversized = []
+        for i, schema in enumerate(schemas):
+            if schema is None:
+                (oversized if len(realms[i].client_roles) > _CLIENTS_PER_PROMPT else pending).append(i)
+        return schemas, keys, pending, oversized
+
+    def _store_result(self, key: Optional[str], llm_output: str) -> str:
+        """Strips an LLM response and, if it is non-empty, remembers it (and caches it when enabled)."""
+        schema_text = llm_output.strip()
+        if key is not None and schema_text:
+            self._responses[key] = schema_text
+            if self.cache_dir:
+                self._write_cache(self._cache_path(key), schema_text)
+        return schema_text
+
+    def _store_batch(self, schemas: list, keys: list, pending: List[int], batch: List[str]):
+        """Places the schemas of a split batch response at their realm positions and caches them."""
+        for i, schema_text in zip(pending, batch):
+            schemas[i] = self._store_result(keys[i], schema_text)
+
+    @staticmethod
+    def _fallback(realm: KeycloakRealm, error: Exception) -> str:
+        """Logs an LLM failure and generates the schema deterministically instead."""
+        logger.error("LLM transformation failed for realm '%s': %s", realm.name, error)
+        logger.info("Falling back to deterministic schema generation for realm '%s'.", realm.name)
+        return SchemaGenerator.generate_schema(realm)
+
+    @staticmethod
+    def _split_batch_response(response: str, count: int):
+        """
+        Splits a batched LLM response on its schema markers.
+
+        :param response: Raw LLM output for a batch prompt.
+        :param count: Number of schemas expected.
+        :return: List of schema texts ordered by realm number, or None if the response is malformed.
+        """
+        parts = _BATCH_MARKER_RE.split(response)
+        # parts = [preamble, number, schema, number, schema, ...]
+        found = {int(number): text.strip() for number, text in zip(parts[1::2], parts[2::2])}
+        if sorted(found) != list(range(1, count + 1)) or not all(found.values()):
+            logger.warning("Batched LLM response did not contain %d well-formed schemas.", count)
+            return None
+        return [found[number] for number in range(1, count + 1)]
+
+    def _prompt_key(self, prompts: List[str]) -> str:
+        """
+        Hashes the exact prompts for a realm together with the model and sampling settings, so a
+        changed prompt template, chunking rule or setting never reuses an older response.
+        BLAKE2b is used for speed; the key only needs to be stable, not cryptographically strong.
+
+        :param prompts: Prompts from _chunk_prompts.
+        :return: 32-character hex digest used for both the in-memory and the on-disk cache.
+        """
+        content = (self.model_name, self.temperature, self.max_tokens, tuple(prompts))
+        return hashlib.blake2b(repr(content).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        """
+        Returns the cache file for a prompt key.
+
+        :param key: Prompt key from _prompt_key.
+        :return: Path of the cache entry (which may not exist yet).
+        """
+        return os.path.join(self.cache_dir, f"{key}.zed")
+
+    @staticmethod
+    def _read_cache(cache_path: str):
+        """Returns the cached schema text, or None on a cache miss."""
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write_cache(cache_path: str, schema_text: str):
+        """Stores a schema in the cache; failures are logged but never fatal."""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(schema_text)
+            os.replace(tmp_path, cache_path)  # Atomic, so concurrent readers never see partial files
+        except OSError as e:
+            logger.warning("Could not write LLM cache entry %s: %s", cache_path, e)
 
     def _generate_prompt(self, realm: KeycloakRealm) -> str:
         """
         Constructs a detailed prompt for the LLM using Keycloak realm data.
 
         :param realm: Parsed Keycloak realm data.
-        :return: A formatted prompt string.
+        :return: A formatted prompt string (the shared prefix followed by the realm details).
+        """
+        return (
+            f"{self._prefix}"
+            f"Keycloak realm '{realm.name}' has the following roles and groups:\n"
+            f"{self._describe_realm(realm)}"
+        )
+
+    def _describe_realm(self, realm: KeycloakRealm) -> str:
+        """
+        Lists a realm's roles, composite roles and groups for use in a prompt.
+
+        :param realm: Parsed Keycloak realm data.
+        :return: One line per item, or a placeholder if the realm is empty.
         """
-        details = []
+        # Every fragment goes into one buffer that is joined once at the end.
+        buf = []
+        append = buf.append
 
         # Add realm roles
         if realm.realm_roles:
-            details.append(f"- Realm roles: {', '.join(realm.realm_roles)}")
+            append("- Realm roles: ")
+            append(", ".join(realm.realm_roles))
+            append("\n")
 
         # Add client roles
         for client, roles in realm.client_roles.items():
-            details.append(f"- Client '{client}' roles: {', '.join(roles)}")
+            append("- Client '")
+            append(client)
+            append("' roles: ")
+            append(", ".join(roles))
+            append("\n")
 
         # Add composite roles
         for comp, parts in realm.composite_roles.items():
-            details.append(f"- Composite role '{comp}' includes: {self._format_composite_roles(parts)}")
+            append("- Composite role '")
+            append(comp)
+            append("' includes: ")
+            append(self._format_composite_roles(parts))
+            append("\n")
 
         # Add groups (with subgroups if present)
         if realm.groups:
-            details.append(f"- Groups: {self._format_groups(realm.groups)}")
+            append("- Groups: ")
+            for index, group in enumerate(realm.groups):
+                if index:
+                    append(", ")
+                append(group.name)
+                if group.subgroups:
+                    append(" (subgroups: ")
+                    append(", ".join([sub.name for sub in group.subgroups]))
+                    append(")")
+            append("\n")
+
+        if not buf:
+            return "(No roles or groups)"
+
+        buf.pop()  # Drop the final line break
+        return "".join(buf)
+
+    def _chunk_prompts(self, realm: KeycloakRealm) -> List[str]:
+        """
+        Builds the prompts for a realm. Realms with more than _CLIENTS_PER_PROMPT clients are
+        split by client: the first prompt covers the realm roles, groups and the first clients,
+        and each further prompt asks only for the definitions of its own clients.
+
+        :param realm: Parsed Keycloak realm data.
+        :return: One prompt per chunk (a single prompt for most realms).
+        """
+        clients = list(realm.client_roles.items())
+        if len(clients) <= _CLIENTS_PER_PROMPT:
+            return [self._generate_prompt(realm)]
+
+        chunks = [clients[start:start + _CLIENTS_PER_PROMPT] for start in range(0, len(clients), _CLIENTS_PER_PROMPT)]
+        prompts = []
+        for number, chunk in enumerate(chunks, start=1):
+            client_roles = dict(chunk)
+            chunk_roles = {role for roles in client_roles.values() for role in roles}
+            if number == 1:
+                chunk_roles.update(realm.realm_roles)
+            part = KeycloakRealm(
+                name=realm.name,
+                realm_roles=realm.realm_roles if number == 1 else [],
+                client_roles=client_roles,
+                groups=realm.groups if number == 1 else [],
+                composite_roles={comp: parts for comp, parts in realm.composite_roles.items() if comp in chunk_roles},
+            )
+            if number == 1:
+                prompts.append(self._generate_prompt(part))
+            else:
+                # Later chunks must not repeat the user, group and realm definitions of the first one.
+                prompts.append(
+                    f"{self._prefix}"
+                    f"This is part {number} of {len(chunks)} of the schema for Keycloak realm '{realm.name}'. "
+                    "The user, group and realm definitions are generated separately: do not define them again, "
+                    "only define the client objects below (they may still reference user and group).\n"
+                    f"{self._describe_realm(part)}"
+                )
+        return prompts
+
+    def _invoke_chunks(self, prompts: List[str]) -> str:
+        """
+        Sends a realm's prompt chunks to the LLM and joins the resulting schemas. Several chunks
+        are sent concurrently unless an event loop is already running in this thread, in which
+        case they are sent one after another.
+
+        :param prompts: Prompts from _chunk_prompts.
+        :return: The combined schema text.
+        """
+        if len(prompts) == 1:
+            return self._invoke(prompts[0])
 
-        details_text = "\n".join(details) if details else "(No roles or groups)"
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._ainvoke_chunks(prompts))
+        return self._join_chunks([self._invoke(prompt_text) for prompt_text in prompts])
+
+    async def _ainvoke_chunks(self, prompts: List[str]) -> str:
+        """
+        Asynchronous variant of _invoke_chunks, with at most _MAX_CONCURRENT_CHUNKS requests in flight.
 
+        :param prompts: Prompts from _chunk_prompts.
+        :return: The combined schema text.
+        """
+        if len(prompts) == 1:
+            return await self._ainvoke(prompts[0])
+
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_CHUNKS)
+
+        async def invoke(prompt_text: str) -> str:
+            async with semaphore:
+                return await self._ainvoke(prompt_text)
+
+        return self._join_chunks(await asyncio.gather(*(invoke(prompt_text) for prompt_text in prompts)))
+
+    @staticmethod
+    def _join_chunks(outputs: List[str]) -> str:
+        """Joins the LLM outputs of a realm's chunks, failing if any chunk came back empty."""
+        parts = [output.strip() for output in outputs]
+        if not all(parts):
+            raise ValueError("LLM returned an empty schema for part of the realm")
+        return "\n\n".join(parts)
+
+    def _generate_batch_prompt(self, realms: List[KeycloakRealm]) -> str:
+        """
+        Constructs a single prompt asking for one schema per realm, each introduced by a
+        numbered marker line so the response can be split again.
+
+        :param realms: Parsed Keycloak realms.
+        :return: A formatted prompt string.
+        """
+        sections = [
+            f"Keycloak realm {number} ('{realm.name}') has the following roles and groups:\n"
+            f"{self._describe_realm(realm)}"
+            for number, realm in enumerate(realms, start=1)
+        ]
         return (
-            f"Keycloak realm '{realm.name}' has the following roles and groups:\n"
-            f"{details_text}\n\n"
-            "Generate a SpiceDB schema definition that represents the above roles and groups.\n"
-            "- Define object types for users, groups, and any resources corresponding to clients.\n"
-            "- Include relations for group membership and role assignments (using role names as relation or permission names).\n"
-            "- If a role is composite or groups have subgroups, represent those relationships (e.g., permissions that combine other roles or a parent-child relation for groups).\n"
-            "Output *only* the SpiceDB schema (object definitions) without additional explanation."
+            f"{self._prefix}"
+            f"Generate a separate schema for each of the {len(realms)} realms below. Start each realm's schema "
+            "with a line of the form '// === SCHEMA <realm number> ===' and output nothing else besides those "
+            "marker lines and the schemas.\n\n"
+            + "\n\n".join(sections)
         )
 
-    def _invoke_llm(self, prompt_text: str) -> str:
+    def _invoke_chat(self, prompt_text: str) -> str:
         """
-        Sends the prompt to the LLM and retrieves the generated SpiceDB schema.
+        Sends the prompt to a chat model as a single user message.
 
         :param prompt_text: The formatted prompt to send to the LLM.
         :return: The schema text generated by the LLM.
         """
-        if hasattr(self.llm, "predict"):
-            return self.llm.predict(prompt_text)  # For LangChain LLMs with a predict method
+        response = self.llm([HumanMessage(content=prompt_text)])
+        return response.content if hasattr(response, "content") else str(response)
 
-        if isinstance(self.llm, ChatOpenAI):
-            response = self.llm([HumanMessage(content=prompt_text)])
-            return response.content if hasattr(response, "content") else str(response)
+    async def _ainvoke_in_thread(self, prompt_text: str) -> str:
+        """
+        Asynchronously sends the prompt to an LLM without an async API by running the
+        synchronous call on a worker thread.
 
-        return self.llm(prompt_text)  # Fallback to calling the LLM instance directly
+        :param prompt_text: The formatted prompt to send to the LLM.
+        :return: The schema text generated by the LLM.
+        """
+        return await asyncio.to_thread(self._invoke, prompt_text)
 
     @staticmethod
     def _format_composite_roles(parts: list) -> str:
@@ -125,13 +498,16 @@ class LLMTransformer:
         :param parts: List of role parts.
         :return: A formatted string representation.
         """
-        realm_roles = [p for p in parts if ":" not in p]
-        client_roles = {}
+        realm_roles = []
+        client_roles = defaultdict(list)
 
+        # One partition per part separates "client:role" references from plain realm roles.
         for part in parts:
-            if ":" in part:
-                client, role = part.split(":", 1)
-                client_roles.setdefault(client, []).append(role)
+            client, sep, role = part.partition(":")
+            if sep:
+                client_roles[client].append(role)
+            else:
+                realm_roles.append(part)
 
         formatted = []
         if realm_roles:
@@ -140,18 +516,3 @@ class LLMTransformer:
             formatted.append(f"{client} roles [{', '.join(roles)}]")
 
         return " and ".join(formatted)
-
-    @staticmethod
-    def _format_groups(groups: list) -> str:
-        """
-        Formats group data, including subgroups.
-
-        :param groups: List of groups.
-        :return: A formatted string representation.
-        """
-        formatted_groups = []
-        for group in groups:
-            subgroups = [sub.name for sub in group.subgroups] if group.subgroups else []
-            formatted_groups.append(f"{group.name} (subgroups: {', '.join(subgroups)})" if subgroups else group.name)
-
-        return ", ".join(formatted_groups)
@@ -4,12 +4,27 @@ Provides deterministic conversion of KeycloakRealm data to a SpiceDB schema.
 Used as a fallback when LLM-based generation is disabled.
 """
 
+import functools
+import io
 import logging
-import re
+import string
 from k2spicedb.keycloak_parser import KeycloakRealm
 
 logger = logging.getLogger(__name__)
 
+_ALLOWED_BYTES = frozenset((string.ascii_letters + string.digits + '_').encode('ascii'))
+# 256-entry lookup table mapping every byte outside [0-9A-Za-z_] to '_'.
+_SANITIZE_TABLE = bytes(b if b in _ALLOWED_BYTES else ord('_') for b in range(256))
+_LEAD_DIGIT = frozenset('0123456789')
+
+
+@functools.lru_cache(maxsize=None)
+def _sanitize(name: str) -> str:
+    """Memoized implementation of SchemaGenerator.sanitize_identifier (bounded by the realm's vocabulary)."""
+    # Non-ASCII characters become a single '?' each, which the table then maps to '_'.
+    sanitized = name.encode('ascii', 'replace').translate(_SANITIZE_TABLE).decode('ascii')
+    return f"_{sanitized}" if sanitized and sanitized[0] in _LEAD_DIGIT else sanitized
+
 
 class SchemaGenerator:
     """Generates a SpiceDB schema from KeycloakRealm data without using an LLM."""
@@ -21,8 +36,7 @@ class SchemaGenerator:
         - Replaces non-alphanumeric characters with underscores.
         - Prefixes with "_" if the name starts with a digit.
         """
-        sanitized = re.sub(r'[^0-9a-zA-Z_]', '_', name)
-        return f"_{sanitized}" if sanitized[0].isdigit() else sanitized
+        return _sanitize(name)
 
     @classmethod
     def generate_schema(cls, realm: KeycloakRealm) -> str:
@@ -33,87 +47,87 @@ class SchemaGenerator:
         - Maps roles and permissions for realm and client roles.
         - Supports nested groups and composite roles.
         """
-        schema_lines = []
+        # Definitions are written straight into one buffer; each block starts with its own newline.
+        out = io.StringIO()
+
+        # Ensure realm name is included in the schema
+        if not realm.realm_roles and not realm.client_roles and not realm.groups:
+            out.write(f"// Realm: {realm.name}\n")
 
         # Base user definition
-        schema_lines.append("definition user {}")
+        out.write("definition user {}")
 
         # Define groups with member relationships
-        cls._add_group_definition(schema_lines, realm)
+        cls._add_group_definition(out, realm)
 
         # Define realm-level roles
-        cls._add_realm_roles(schema_lines, realm)
+        cls._add_realm_roles(out, realm)
 
         # Define client-specific roles
-        cls._add_client_roles(schema_lines, realm)
+        cls._add_client_roles(out, realm)
 
-        # Ensure realm name is included in the schema
-        if not realm.realm_roles and not realm.client_roles and not realm.groups:
-            schema_lines.insert(0, f"// Realm: {realm.name}")
-
-        # Fix: Assign schema_text before using it
-        schema_text = "\n".join(schema_lines)
+        schema_text = out.getvalue()
 
         logger.info("Schema generated for realm '%s':\n%s", realm.name, schema_text)
 
         return schema_text
 
     @classmethod
-    def _add_group_definition(cls, schema_lines: list, realm: KeycloakRealm):
+    def _add_group_definition(cls, out: io.StringIO, realm: KeycloakRealm):
         """Adds the SpiceDB group definition, supporting nested groups."""
         if not realm.groups:
             return
 
-        group_def = [
-            "definition group {",
-            "    relation member: user"
-        ]
+        out.write("\ndefinition group {\n    relation member: user")
         if any(group.subgroups for group in realm.groups):
-            group_def.append("    relation parent: group")  # Support nested groups
-        group_def.append("}")
-
-        schema_lines.append("\n".join(group_def))
+            out.write("\n    relation parent: group")  # Support nested groups
+        out.write("\n}")
 
     @classmethod
-    def _add_realm_roles(cls, schema_lines: list, realm: KeycloakRealm):
+    def _add_realm_roles(cls, out: io.StringIO, realm: KeycloakRealm):
         """Adds SpiceDB object definitions for realm-level roles."""
         if not realm.realm_roles:
             return
 
-        realm_def = ["definition realm {"]
+        write = out.write
+        write("\ndefinition realm {")
         for role in realm.realm_roles:
-            safe_role = cls.sanitize_identifier(role)
-            realm_def.append(f"    relation {safe_role}: user")
+            write("\n    relation ")
+            write(cls.sanitize_identifier(role))
+            write(": user")
 
         # Handle composite realm roles (permissions derived from multiple roles)
+        realm_role_set = frozenset(realm.realm_roles)  # Hash lookups instead of a list scan per composite
         for composite_role, parts in realm.composite_roles.items():
-            if composite_role in realm.realm_roles:
-                cls._add_composite_permissions(realm_def, composite_role, parts)
+            if composite_role in realm_role_set:
+                cls._add_composite_permissions(out, composite_role, parts)
 
-        realm_def.append("}")
-        schema_lines.append("\n".join(realm_def))
+        write("\n}")
 
     @classmethod
-    def _add_client_roles(cls, schema_lines: list, realm: KeycloakRealm):
+    def _add_client_roles(cls, out: io.StringIO, realm: KeycloakRealm):
         """Adds SpiceDB object definitions for client roles."""
+        write = out.write
         for client, roles in realm.client_roles.items():
-            safe_client = cls.sanitize_identifier(client)
-            client_def = [f"definition {safe_client} {{"]
+            write("\ndefinition ")
+            write(cls.sanitize_identifier(client))
+            write(" {")
 
             for role in roles:
-                safe_role = cls.sanitize_identifier(role)
-                client_def.append(f"    relation {safe_role}: user")
+                write("\n    relation ")
+                write(cls.sanitize_identifier(role))
+                write(": user")
 
             # Handle composite roles that only include roles from the same client
+            role_set = frozenset(roles)
             for composite_role, parts in realm.composite_roles.items():
-                if composite_role in roles:
-                    cls._add_composite_permissions(client_def, composite_role, parts, roles)
+                if composite_role in role_set:
+                    cls._add_composite_permissions(out, composite_role, parts, role_set)
 
-            client_def.append("}")
-            schema_lines.append("\n".join(client_def))
+            write("\n}")
 
     @classmethod
-    def _add_composite_permissions(cls, definition_lines: list, composite_role: str, parts: list, valid_roles=None):
+    def _add_composite_permissions(cls, out: io.StringIO, composite_role: str, parts: list, valid_roles=None):
         """
         Adds composite role permissions to the schema.
         - `valid_roles` is used to restrict composite roles to specific scopes (realm vs client).
@@ -124,8 +138,7 @@ class SchemaGenerator:
         valid_parts = [cls.sanitize_identifier(p) for p in parts if not valid_roles or p in valid_roles]
 
         if valid_parts:
-            definition_lines.append(f"    permission {safe_composite} = " + " + ".join(valid_parts))
+            out.write(f"\n    permission {safe_composite} = ")
+            out.write(" + ".join(valid_parts))
         else:
-            definition_lines.append(
-                f"    // Composite role '{composite_role}' spans multiple scopes (not fully expanded)"
-            )
+            out.write(f"\n    // Composite role '{composite_role}' spans multiple scopes (not fully expanded)")
@@ -3,9 +3,11 @@ import json
 import shutil
 import tempfile
 import unittest
+from unittest import mock
 
 from k2spicedb import cli
 from k2spicedb.keycloak_parser import KeycloakParser
+from k2spicedb.llm_transformer import LLMTransformer
 from k2spicedb.schema_generator import SchemaGenerator
 
 # Disable logging
@@ -144,3 +146,60 @@ class TestCLI(unittest.TestCase):
         # Both output files should contain at least the user definition
         self.assertIn("definition user", content1)
         self.assertIn("definition user", content2)
+
+    def test_cli_multiple_with_llm(self):
+        """
+        Test the concurrent LLM path with a stub LLM: every input file in the directory
+        should get its own output file containing the LLM's response.
+        """
+        class StubLLM:
+            def predict(self, prompt):
+                return "definition stub {}"
+
+        input_file2 = os.path.join(self.tempdir, "realm2.json")
+        with open(input_file2, 'w', encoding='utf-8') as f:
+            json.dump({"realm": "SecondRealm", "roles": {"realm": [{"name": "viewer"}]}}, f)
+        output_dir = os.path.join(self.tempdir, "outdir")
+
+        with mock.patch.object(cli, "LLMTransformer", lambda **kwargs: LLMTransformer(llm=StubLLM())):
+            ret_code = cli.main([self.tempdir, "-o", output_dir, "-j", "2", "--no-cache"])
+        self.assertEqual(ret_code, 0)
+
+        for name in ("realm.zed", "realm2.zed"):
+            with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), "definition stub {}")
+
+    def test_process_many_with_llm(self):
+        """process_many should return one schema per readable file, keyed by input path."""
+        class StubLLM:
+            def predict(self, prompt):
+                return "definition stub {}"
+
+        missing_file = os.path.join(self.tempdir, "missing.json")
+        with mock.patch.object(cli, "LLMTransformer", lambda **kwargs: LLMTransformer(llm=StubLLM())):
+            schemas = cli.process_many([self.input_file, missing_file], max_workers=2)
+
+        self.assertDictEqual(schemas, {self.input_file: "definition stub {}"})
+
+    def test_cli_cache_flag(self):
+        """The LLM response cache is only used when --cache is given."""
+        seen = []
+
+        def make_transformer(**kwargs):
+            seen.append(kwargs.get("cache_dir"))
+            return LLMTransformer(llm=mock.Mock(predict=lambda prompt: "definition stub {}"))
+
+        output_file = os.path.join(self.tempdir, "out.zed")
+        with mock.patch.object(cli, "LLMTransformer", make_transformer):
+            self.assertEqual(cli.main([self.input_file, "-o", output_file]), 0)
+            self.assertEqual(cli.main([self.input_file, "-o", output_file, "--cache"]), 0)
+
+        self.assertListEqual(seen, [None, cli.DEFAULT_CACHE_DIR])
+
+    def test_pool_workers_set_up_logging(self):
+        """Pool workers configure logging with the CLI's verbosity, since spawned ones start without it."""
+        with mock.patch.object(cli, "setup_logging") as setup_logging, \
+                mock.patch.object(cli, "_worker_parser", None):
+            cli._init_worker(KeycloakParser(), True)
+            self.assertIsInstance(cli._worker_parser, KeycloakParser)
+        setup_logging.assert_called_once_with(True)
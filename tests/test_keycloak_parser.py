@@ -1,7 +1,13 @@
 import io
+import os
 import json
+import shutil
+import sys
+import tempfile
 import unittest
+from unittest import mock
 
+from k2spicedb import keycloak_parser
 from k2spicedb.keycloak_parser import KeycloakParser, KeycloakRealm, Group
 
 # Disable logging while testing to keep output clean
@@ -11,6 +17,18 @@ logging.disable(logging.CRITICAL)
 class TestKeycloakParser(unittest.TestCase):
     def setUp(self):
         self.parser = KeycloakParser()
+        # Temporary directory for export files written by _write_export
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def _write_export(self, name, data, **dump_kwargs):
+        """Writes data as JSON to a file in the temporary directory and returns its path"""
+        path = os.path.join(self.tempdir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        return path
 
     def test_parse_basic_realm(self):
         # Construct a minimal realm JSON structure
@@ -69,3 +87,130 @@ class TestKeycloakParser(unittest.TestCase):
         comp_parts = realm.composite_roles["composite_role"]
         self.assertIn("admin", comp_parts)
         self.assertIn("myapp:app_viewer", comp_parts)
+
+    def test_parse_many_preserves_order(self):
+        paths = [
+            self._write_export(f"realm{i}.json", {"realm": f"Realm{i}", "roles": {"realm": [{"name": f"role{i}"}]}})
+            for i in range(5)
+        ]
+
+        realms = self.parser.parse_many(paths, max_workers=3)
+
+        self.assertListEqual([r.name for r in realms], [f"Realm{i}" for i in range(5)])
+        self.assertListEqual([r.realm_roles for r in realms], [[f"role{i}"] for i in range(5)])
+
+    def test_composite_roles_from_many_clients(self):
+        # Composite roles defined on client roles are picked up for every client
+        realm_data = {
+            "realm": "ManyClients",
+            "roles": {
+                "realm": [],
+                "client": {
+                    f"app{i}": [
+                        {"name": f"viewer{i}", "composite": False},
+                        {"name": f"editor{i}", "composite": True,
+                         "composites": {"client": {f"app{i}": [f"viewer{i}"]}}}
+                    ]
+                    for i in range(50)
+                }
+            }
+        }
+        realm = self.parser.parse_data(realm_data)
+
+        self.assertEqual(len(realm.composite_roles), 50)
+        self.assertListEqual(realm.composite_roles["editor7"], ["app7:viewer7"])
+
+    def test_all_subgroup_names_order(self):
+        # Direct subgroups first, then the nested names under each of them in turn
+        group = Group(name="root", subgroups=[
+            Group(name="a", subgroups=[Group(name="a1", subgroups=[Group(name="a1x")])]),
+            Group(name="b", subgroups=[Group(name="b1")]),
+        ])
+        self.assertListEqual(group.all_subgroup_names(), ["a", "b", "a1", "a1x", "b1"])
+
+    def test_identical_client_roles_are_shared(self):
+        service_roles = [{"name": "uma_protection"}, {"name": "read-token"}]
+        realm = self.parser.parse_data({
+            "realm": "SharedRoles",
+            "roles": {"client": {"svc-a": service_roles, "svc-b": list(service_roles), "app": [{"name": "x"}]}}
+        })
+
+        self.assertEqual(list(realm.client_roles["svc-a"]), ["uma_protection", "read-token"])
+        self.assertIs(realm.client_roles["svc-a"], realm.client_roles["svc-b"])
+
+    def test_parse_file_with_each_json_backend(self):
+        path = self._write_export("realm.json", {"realm": "Bücher", "roles": {"realm": [{"name": "lesen"}]}},
+                                  ensure_ascii=False)
+
+        # Whichever decoder is installed (orjson or stdlib) and the stdlib fallback must agree
+        for loads in (keycloak_parser._json_loads, json.loads):
+            with mock.patch.object(keycloak_parser, "_json_loads", loads):
+                realm = self.parser.parse_file(path)
+            self.assertEqual(realm.name, "Bücher")
+            self.assertListEqual(realm.realm_roles, ["lesen"])
+
+    @unittest.skipIf(keycloak_parser.cysimdjson is None, "cysimdjson is not installed")
+    def test_parse_large_file_keeps_realm_data(self):
+        # Large exports take the selective simdjson path; the parsed realm must be identical
+        realm_data = {
+            "realm": "BigRealm",
+            "roles": {"realm": [{"name": "admin"}], "client": {"app": [{"name": "read"}]}},
+            "groups": [{"name": "g", "subGroups": [{"name": "sub", "subGroups": []}]}],
+            "users": [{"username": f"user{i}", "attributes": {"x": "y" * 50}} for i in range(2000)]
+        }
+        path = self._write_export("big.json", realm_data)
+
+        # The full JSON loader must not be reached, so the file was decoded by simdjson
+        with mock.patch.object(keycloak_parser, "_json_loads", side_effect=AssertionError("full decode")):
+            realm = self.parser.parse_file(path)
+        self.assertEqual(realm, self.parser.parse_data(realm_data))
+
+    def test_deep_group_tree_beyond_recursion_limit(self):
+        # Group trees are walked iteratively, so nesting deeper than the recursion limit must work
+        depth = sys.getrecursionlimit() + 100
+        root = {"name": "g0", "subGroups": []}
+        current = root
+        for level in range(1, depth):
+            child = {"name": f"g{level}", "subGroups": []}
+            current["subGroups"].append(child)
+            current = child
+
+        realm = self.parser.parse_data({"realm": "Deep", "groups": [root]})
+        self.assertListEqual(realm.groups[0].all_subgroup_names(), [f"g{level}" for level in range(1, depth)])
+
+    @unittest.skipIf(keycloak_parser.ijson is None, "ijson is not installed")
+    def test_streamed_parse_matches_full_parse(self):
+        realm_data = {
+            "id": "streamed-id",
+            "users": [{"username": "u", "realm": "not-the-realm-name"}],
+            "realm": "Streamed",
+            "roles": {"realm": [{"name": "admin", "composite": True, "composites": {"client": {"app": ["read"]}}}],
+                      "client": {"app": [{"name": "read"}]}},
+            "groups": [{"name": "g", "subGroups": [{"name": "sub", "subGroups": []}]}],
+        }
+        path = self._write_export("streamed.json", realm_data)
+
+        with mock.patch.object(keycloak_parser, "_STREAM_MIN_BYTES", 0), \
+                mock.patch.object(keycloak_parser, "cysimdjson", None):
+            realm = self.parser.parse_file(path)
+            self.assertEqual(realm, self.parser.parse_data(realm_data))
+
+            # A top-level value that is not an object is rejected, not parsed as an empty realm
+            self._write_export("streamed.json", [realm_data])
+            with self.assertRaises(ValueError):
+                self.parser.parse_file(path)
+
+    def test_role_names_are_interned(self):
+        data = json.loads(json.dumps({
+            "realm": "Interned",
+            "roles": {
+                "realm": [{"name": "viewer"},
+                          {"name": "editor", "composite": True, "composites": {"realm": ["viewer"]}}],
+                "client": {"app": [{"name": "viewer"}]},
+            },
+        }))
+        realm = self.parser.parse_data(data)
+
+        # Every occurrence of "viewer" is the same string object
+        self.assertIs(realm.realm_roles[0], realm.client_roles["app"][0])
+        self.assertIs(realm.realm_roles[0], realm.composite_roles["editor"][0])
@@ -1,6 +1,10 @@
+import asyncio
+import os
+import shutil
+import tempfile
 import unittest
 from k2spicedb.keycloak_parser import KeycloakRealm
-from k2spicedb.llm_transformer import LLMTransformer
+from k2spicedb.llm_transformer import LLMTransformer, PROMPT_HEADER
 
 # Disable logging in tests
 import logging
@@ -30,7 +34,24 @@ class DummyLLM:
     def predict(self, prompt):
         return self.__call__(prompt)
 
+class BatchLLM:
+    """Dummy LLM that answers batched prompts with one marked schema per realm"""
+    def __init__(self, count):
+        self.count = count
+        self.calls = 0
+
+    def predict(self, prompt):
+        self.calls += 1
+        return "\n".join(f"// === SCHEMA {i} ===\ndefinition realm{i} {{}}" for i in range(1, self.count + 1))
+
 class TestLLMTransformer(unittest.TestCase):
+    def setUp(self):
+        # Temporary directory for the on-disk response cache
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
     def test_transform_with_dummy_llm(self):
         
         # Prepare a simple realm input
@@ -66,3 +87,110 @@ class TestLLMTransformer(unittest.TestCase):
         
         # Should also contain the realm role 'r1' as a relation in realm object (sanitized)
         self.assertIn("relation r1:", result)
+
+    def test_transform_uses_cache(self):
+        realm = KeycloakRealm(name="CachedRealm", realm_roles=["r1"], client_roles={}, groups=[])
+
+        first_llm = DummyLLM(fail=False)
+        transformer = LLMTransformer(llm=first_llm, cache_dir=self.cache_dir)
+        self.assertEqual(transformer.transform(realm), "dummy schema output")
+        self.assertIsNotNone(first_llm.last_prompt)
+
+        # A second transformer with the same cache must not call its LLM at all
+        second_llm = DummyLLM(fail=True)
+        transformer = LLMTransformer(llm=second_llm, cache_dir=self.cache_dir)
+        self.assertEqual(transformer.transform(realm), "dummy schema output")
+        self.assertIsNone(second_llm.last_prompt)
+
+    def test_fallback_is_not_cached(self):
+        realm = KeycloakRealm(name="X", realm_roles=["r1"], client_roles={}, groups=[])
+
+        LLMTransformer(llm=DummyLLM(fail=True), cache_dir=self.cache_dir).transform(realm)
+        result = LLMTransformer(llm=DummyLLM(fail=False), cache_dir=self.cache_dir).transform(realm)
+
+        self.assertEqual(result, "dummy schema output")
+
+    def test_atransform_batch_single_request(self):
+        realms = [KeycloakRealm(name=f"R{i}", realm_roles=[f"role{i}"]) for i in range(3)]
+        batch_llm = BatchLLM(count=3)
+        schemas = asyncio.run(LLMTransformer(llm=batch_llm).atransform_batch(realms))
+
+        self.assertEqual(batch_llm.calls, 1)
+        self.assertListEqual(schemas, [f"definition realm{i} {{}}" for i in range(1, 4)])
+
+    def test_atransform_batch_malformed_response_falls_back(self):
+        realms = [KeycloakRealm(name=f"R{i}", realm_roles=[f"role{i}"]) for i in range(2)]
+        schemas = asyncio.run(LLMTransformer(llm=DummyLLM(fail=False)).atransform_batch(realms))
+
+        # "dummy schema output" has no markers, so each realm is transformed individually
+        self.assertListEqual(schemas, ["dummy schema output", "dummy schema output"])
+
+    def test_prompts_share_invariant_prefix(self):
+        # Every prompt must start with the same bytes so providers can reuse their prompt cache
+        dummy_llm = DummyLLM(fail=False)
+        transformer = LLMTransformer(llm=dummy_llm)
+        for realm in (KeycloakRealm(name="A", realm_roles=["a"]), KeycloakRealm(name="B", client_roles={"c": ["b"]})):
+            transformer.transform(realm)
+            self.assertTrue(dummy_llm.last_prompt.startswith(PROMPT_HEADER))
+
+    def test_empty_realm_skips_llm(self):
+        dummy_llm = DummyLLM(fail=True)
+        result = LLMTransformer(llm=dummy_llm).transform(KeycloakRealm(name="Empty"))
+
+        self.assertIsNone(dummy_llm.last_prompt)
+        self.assertIn("definition user", result)
+
+    def test_identical_realms_call_llm_once(self):
+        batch_llm = BatchLLM(count=1)
+        transformer = LLMTransformer(llm=batch_llm)
+        for _ in range(3):
+            transformer.transform(KeycloakRealm(name="Same", realm_roles=["r1"], client_roles={"c": ["x"]}))
+
+        self.assertEqual(batch_llm.calls, 1)
+
+    def test_cache_key_covers_prompt_and_settings(self):
+        realm = KeycloakRealm(name="Hashed", realm_roles=["r1"])
+        LLMTransformer(llm=DummyLLM(fail=False), cache_dir=self.cache_dir).transform(realm)
+
+        # The entry is named by a 16-byte BLAKE2b digest of the prompt and settings
+        transformer = LLMTransformer(llm=DummyLLM(fail=True), cache_dir=self.cache_dir)
+        key = transformer._prompt_key(transformer._chunk_prompts(realm))
+        self.assertEqual(os.listdir(self.cache_dir), [f"{key}.zed"])
+        self.assertEqual(len(key), 32)
+        self.assertEqual(transformer.transform(realm), "dummy schema output")
+
+        # A different prompt template or sampling setting must not reuse the entry
+        changed_prompt = LLMTransformer(llm=DummyLLM(fail=False), cache_dir=self.cache_dir)
+        changed_prompt._prefix = "Different instructions.\n"
+        changed_settings = LLMTransformer(llm=DummyLLM(fail=False), cache_dir=self.cache_dir, temperature=0.5)
+        for other in (changed_prompt, changed_settings):
+            self.assertIsNone(other._lookup(realm)[2])
+
+    def test_prompt_groups_composite_parts_by_client(self):
+        dummy_llm = DummyLLM(fail=False)
+        realm = KeycloakRealm(name="Comp", realm_roles=["admin", "a"],
+                              composite_roles={"admin": ["a", "app:x", "app:y", "other:z:w"]})
+        LLMTransformer(llm=dummy_llm).transform(realm)
+
+        self.assertIn("includes: realm roles [a] and app roles [x, y] and other roles [z:w]", dummy_llm.last_prompt)
+
+    def test_large_realm_is_split_by_client(self):
+        class RecordingLLM:
+            def __init__(self):
+                self.prompts = []
+
+            def predict(self, prompt):
+                self.prompts.append(prompt)
+                return f"// part {len(self.prompts)}"
+
+        recording_llm = RecordingLLM()
+        realm = KeycloakRealm(name="Big", realm_roles=["admin"],
+                              client_roles={f"client{i}": [f"role{i}"] for i in range(45)})
+        result = LLMTransformer(llm=recording_llm).transform(realm)
+
+        # 45 clients -> three prompts; only the first one describes the realm roles
+        self.assertEqual(len(recording_llm.prompts), 3)
+        self.assertEqual(sum("Realm roles: admin" in prompt for prompt in recording_llm.prompts), 1)
+        for i in range(45):
+            self.assertEqual(sum(f"Client 'client{i}' roles" in prompt for prompt in recording_llm.prompts), 1)
+        self.assertEqual(result.count("// part"), 3)
@@ -1,58 +1,83 @@
-import unittest
-from k2spicedb.keycloak_parser import KeycloakRealm, Group
-from k2spicedb.schema_generator import SchemaGenerator
+import pytest
 
-# Disable logging
+# Disable logging (k2spicedb itself is imported inside the tests to keep collection cheap)
 import logging
 logging.disable(logging.CRITICAL)
 
-class TestSchemaGenerator(unittest.TestCase):
-    def test_generate_schema_basic(self):
-        
-        # Create a realm with one realm role, one client role, and groups
-        group = Group(name="team1", subgroups=[Group(name="team1_sub")])
-        
-        realm = KeycloakRealm(
-            name="TestRealm",
-            realm_roles=["admin"], 
-            client_roles={"app": ["read"]},
-            groups=[group],
-            composite_roles={}  # no composite in this test
-        )
-        schema = SchemaGenerator.generate_schema(realm)
-        
+def _assert_all_in(schema, expected):
+    """Asserts that every expected fragment occurs in schema"""
+    missing = [fragment for fragment in expected if fragment not in schema]
+    assert not missing, f"Missing from schema: {missing}"
+
+@pytest.fixture(scope="session")
+def basic_schema():
+    from k2spicedb.keycloak_parser import KeycloakRealm, Group
+    from k2spicedb.schema_generator import SchemaGenerator
+
+    # Create a realm with one realm role, one client role, and groups
+    group = Group(name="team1", subgroups=[Group(name="team1_sub")])
+
+    realm = KeycloakRealm(
+        name="TestRealm",
+        realm_roles=["admin"],
+        client_roles={"app": ["read"]},
+        groups=[group],
+        composite_roles={}  # no composite in this case
+    )
+    return SchemaGenerator.generate_schema(realm)
+
+@pytest.fixture(scope="session")
+def composite_schema():
+    from k2spicedb.keycloak_parser import KeycloakRealm
+    from k2spicedb.schema_generator import SchemaGenerator
+
+    # Realm with a composite role and a base role
+    realm = KeycloakRealm(
+        name="CompRealm",
+        realm_roles=["base", "composite"],
+        client_roles={},
+        groups=[],
+        composite_roles={"composite": ["base"]}
+    )
+    return SchemaGenerator.generate_schema(realm)
+
+@pytest.mark.parametrize("schema_fixture, expected_substrings, ordering_pairs", [
+    pytest.param("basic_schema", [
         # Basic components should be present
-        self.assertIn("definition user {}", schema)
-        
+        "definition user {}",
         # Group definition with member relation
-        self.assertIn("definition group {\n    relation member: user", schema)
-        
+        "definition group {\n    relation member: user",
         # Since there's a subgroup, parent relation should appear
-        self.assertIn("relation parent: group", schema)
-       
+        "relation parent: group",
         # Realm definition with admin role
-        self.assertIn("definition realm {\n    relation admin: user", schema)
-       
+        "definition realm {\n    relation admin: user",
         # Client object definition (app) with read role
-        self.assertIn("definition app {\n    relation read: user", schema)
-
-    def test_generate_schema_with_composites(self):
-       
-        # Realm with a composite role and a base role
-        realm = KeycloakRealm(
-            name="CompRealm",
-            realm_roles=["base", "composite"], 
-            client_roles={}, 
-            groups=[],
-            composite_roles={"composite": ["base"]}
-        )
-        schema = SchemaGenerator.generate_schema(realm)
-       
+        "definition app {\n    relation read: user",
+    ], [], id="basic"),
+    pytest.param("composite_schema", [
         # Should have base relation and composite permission in realm definition
-        self.assertIn("relation base: user", schema)
-        self.assertIn("permission composite = base", schema)
-       
+        "relation base: user",
+        "permission composite = base",
+    ], [
         # Composite permission should be inside realm definition
-        realm_def_index = schema.index("definition realm")
-        perm_index = schema.index("permission composite")
-        self.assertGreater(perm_index, realm_def_index)
+        ("definition realm", "permission composite"),
+    ], id="composites"),
+])
+def test_generate_schema(request, schema_fixture, expected_substrings, ordering_pairs):
+    schema = request.getfixturevalue(schema_fixture)
+
+    _assert_all_in(schema, expected_substrings)
+    for before, after in ordering_pairs:
+        # One forward search starting where `before` was found proves the order
+        start = schema.find(before)
+        assert start != -1, f"Missing from schema: {before!r}"
+        assert schema.find(after, start + len(before)) != -1, f"{after!r} not found after {before!r}"
+
+def test_parent_relation_follows_groups_added_later():
+    from k2spicedb.keycloak_parser import KeycloakRealm, Group
+    from k2spicedb.schema_generator import SchemaGenerator
+
+    # Nesting is read from the groups at generation time, so later edits are picked up
+    realm = KeycloakRealm(name="Edited")
+    realm.groups.append(Group(name="g", subgroups=[Group(name="s")]))
+    assert "relation parent: group" in SchemaGenerator.generate_schema(realm)